@@ -1,15 +1,23 @@
-import os
-import pandas as pd
-import numpy as np
 import streamlit as st 
 import google.generativeai as genai
-import time
-import tempfile
-from pathlib import Path
-from phi.agent import Agent
-from phi.model.google import Gemini
-from phi.tools.duckduckgo import DuckDuckGo
-from google.generativeai import upload_file, get_file
+import gc
+import io
+import sys
+from concurrent.futures import Future
+from insighthub.core import (
+    DIRECT_WRITE_LIMIT,
+    JOB_POLL_INTERVAL,
+    LARGE_BUFFER_THRESHOLD,
+    analyze_data,
+    analyze_image,
+    analyze_video,
+    get_tmp_pool,
+    load_dataframe,
+    split_answers,
+    submit_job,
+    summarize_dataset,
+    write_upload,
+)
 
 # Setting up the Page Configuration
 st.set_page_config(
@@ -43,14 +51,52 @@ else:
     st.sidebar.warning("Please enter a valid API key to proceed.")
     st.stop()
 
-@st.cache_resource
-def initialize_agent():
-    return Agent(
-        name="Media AI Analyzer",
-        model=Gemini(id="gemini-2.0-flash-exp"),
-        tools=[DuckDuckGo()],
-        markdown=True,
-    )
+def job_outcome(job):
+    try:
+        return ("result", job.result())
+    except Exception as error:
+        return ("error", f"An error occurred during analysis: {error}")
+
+def show_result(outcome):
+    status, content = outcome
+    if status == "error":
+        st.error(content)
+    else:
+        # Display the result, one section per question when several were asked
+        st.subheader("Analysis Result")
+        for index, (heading, answer) in enumerate(split_answers(content)):
+            if index:
+                st.divider()
+            if heading:
+                st.markdown(f"#### {heading}")
+            st.markdown(answer)
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def poll_job(key, message):
+    # Checks on the job without waiting for it, so the script thread stays free for other reruns
+    _, job = st.session_state.get(key, (None, None))
+    if isinstance(job, Future) and not job.done():
+        st.info(message)
+        return
+    # Rerun the page so the result is rendered and this poller stops
+    st.rerun()
+
+def render_job(key, file_id, message):
+    job_file_id, job = st.session_state.get(key, (None, None))
+    if job_file_id != file_id:
+        # The job belongs to a previously uploaded file, so its result is dropped
+        st.session_state.pop(key, None)
+        return
+
+    if isinstance(job, Future) and job.done():
+        # Keep only the rendered text; the future, and any traceback it holds, pins the job's inputs
+        job = job_outcome(job)
+        st.session_state[key] = (file_id, job)
+
+    if isinstance(job, Future):
+        poll_job(key, message)
+    elif job is not None:
+        show_result(job)
 
 # Custom CSS
 st.markdown("""
@@ -64,9 +110,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-## Initialize the agent
-multimodal_Agent = initialize_agent()
-
 # Create tabs for different media types
 media_type = st.tabs(["Video Analysis", "Image Analysis", "Data Analysis"])
 
@@ -76,52 +119,34 @@ with media_type[0]:  # Video Analysis Tab
                                  help="Upload a video for AI analysis")
 
     if video_file:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_video:
-            temp_video.write(video_file.read())
-            video_path = temp_video.name
+        video_path = write_upload(video_file)
 
         st.video(video_path, format="video/mp4", start_time=0)
 
         user_query = st.text_area(
             "What insights are you seeking from the video?",
             placeholder="Ask anything about the video content. The AI agent will analyze and gather additional context if needed.",
-            help="Provide specific questions or insights you want from the video.",
+            help="Provide specific questions or insights you want from the video. Put each question on its own line to ask several at once.",
             key="video_query"
         )
 
+        submitted = False
         if st.button("🔍 Analyze Video", key="analyze_video_button"):
             if not user_query:
                 st.warning("Please enter a question or insight to analyze the video.")
             else:
-                try:
-                    with st.spinner("Processing video and gathering insights..."):
-                        # Upload and process video file
-                        processed_video = upload_file(video_path)
-                        while processed_video.state.name == "PROCESSING":
-                            time.sleep(1)
-                            processed_video = get_file(processed_video.name)
-
-                        # Prompt generation for video analysis
-                        analysis_prompt = f"""
-                            Analyze the uploaded video for content and context.
-                            Respond to the following query using video insights and supplementary web research:
-                            {user_query}
-
-                            Provide a detailed, user-friendly, and actionable response.
-                            """
-
-                        # AI agent processing
-                        response = multimodal_Agent.run(analysis_prompt, videos=[processed_video])
-
-                    # Display the result
-                    st.subheader("Analysis Result")
-                    st.markdown(response.content)
-
-                except Exception as error:
-                    st.error(f"An error occurred during analysis: {error}")
-                finally:
-                    # Clean up temporary video file
-                    Path(video_path).unlink(missing_ok=True)
+                # The job hands the temporary file back to the pool once uploaded
+                submit_job(
+                    "video_job", video_file.file_id, analyze_video,
+                    video_path, video_file.type or "video/mp4", video_file.name, user_query, api_key
+                )
+                submitted = True
+
+        if not submitted:
+            # st.video has already read the file, so it can go straight back to the pool
+            get_tmp_pool().release(video_path)
+
+        render_job("video_job", video_file.file_id, "Processing video and gathering insights...")
 
 with media_type[1]:  # Image Analysis Tab
     st.subheader("Image Analysis")
@@ -135,7 +160,7 @@ with media_type[1]:  # Image Analysis Tab
         user_query = st.text_area(
             "What would you like to know about this image?",
             placeholder="Ask anything about the image content. The AI agent will analyze and provide detailed insights.",
-            help="Provide specific questions or aspects you want analyzed in the image.",
+            help="Provide specific questions or aspects you want analyzed in the image. Put each question on its own line to ask several at once.",
             key="image_query"
         )
 
@@ -143,96 +168,72 @@ with media_type[1]:  # Image Analysis Tab
             if not user_query:
                 st.warning("Please enter a question or insight to analyze the image.")
             else:
-                try:
-                    with st.spinner("Analyzing image and gathering insights..."):
-                        # Create temporary file for image
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_image:
-                            temp_image.write(image_file.getbuffer())
-                            image_path = temp_image.name
-
-                        # Upload and process image file
-                        processed_image = upload_file(image_path)
-
-                        # Prompt generation for image analysis
-                        analysis_prompt = f"""
-                            Analyze the uploaded image in detail.
-                            Respond to the following query using image analysis and supplementary web research:
-                            {user_query}
-
-                            Provide a comprehensive, detailed, and informative response covering visual elements, 
-                            context, and any relevant insights.
-                            """
-
-                        # AI agent processing
-                        response = multimodal_Agent.run(analysis_prompt, images=[processed_image])
-
-                    # Display the result
-                    st.subheader("Analysis Result")
-                    st.markdown(response.content)
-
-                except Exception as error:
-                    st.error(f"An error occurred during analysis: {error}")
-                finally:
-                    # Clean up temporary image file
-                    Path(image_path).unlink(missing_ok=True)
+                # Upload straight from memory; only very large images go through a temporary file
+                if image_file.size < DIRECT_WRITE_LIMIT:
+                    image = io.BytesIO(image_file.getvalue())
+                else:
+                    image = write_upload(image_file)
 
-with media_type[2]:  # Data Analysis Tab
-    st.subheader("Data Analysis")
-    data_file = st.file_uploader("Upload a data file (Excel or CSV)", type=['csv', 'xlsx'], key="data_uploader",
-                                 help="Upload a dataset for AI analysis")
+                submit_job(
+                    "image_job", image_file.file_id, analyze_image,
+                    image, image_file.type or "image/png", image_file.name, user_query, api_key
+                )
 
-    if data_file:
-        try:
-            # Read and parse the uploaded file
-            if data_file.name.endswith('.csv'):
-                data = pd.read_csv(data_file)
-            elif data_file.name.endswith('.xlsx'):
-                data = pd.read_excel(data_file)
-
-            # Display the uploaded data
-            st.write("Uploaded Dataset:")
-            st.dataframe(data.head())
-
-            # Serialize the dataset for AI analysis
-            dataset_text = data.to_string(index=False)
-
-            # User query input for insights
-            user_query = st.text_area(
-                "What would you like to know about this dataset?",
-                placeholder="Ask anything about the dataset. The AI agent will analyze and provide detailed insights.",
-                help="Provide specific questions or ask for general insights about the data.",
-                key="data_query"
-            )
-
-            if st.button("🔍 Analyze Data", key="analyze_data_button"):
-                if not user_query:
-                    st.warning("Please enter a question or insight to analyze the data.")
-                else:
-                    try:
-                        with st.spinner("Analyzing data and gathering insights..."):
-                            # Prepare the analysis prompt
-                            analysis_prompt = f"""
-                                Here is the dataset:
-                                {dataset_text}
+        render_job("image_job", image_file.file_id, "Analyzing image and gathering insights...")
+
+@st.fragment
+def data_analysis(data_file):
+    # Runs as a fragment, so typing a query or clicking Analyze reruns only this part of the tab
+    submitted = False
+    try:
+        # Read and parse the uploaded file
+        data = load_dataframe(data_file)
 
-                                Respond to the following query using data analysis techniques:
-                                {user_query}
+        # Display the uploaded data
+        st.write("Uploaded Dataset:")
+        st.dataframe(data.head())
 
-                                Provide relevant statistics, trends, or actionable insights based on the dataset.
-                            """
+        # Summarize the dataset for AI analysis
+        dataset_text = summarize_dataset(data_file, data)
 
-                            # AI agent processing
-                            response = multimodal_Agent.run(analysis_prompt)
+        # User query input for insights
+        user_query = st.text_area(
+            "What would you like to know about this dataset?",
+            placeholder="Ask anything about the dataset. The AI agent will analyze and provide detailed insights.",
+            help="Provide specific questions or ask for general insights about the data. Put each question on its own line to ask several at once.",
+            key="data_query"
+        )
+
+        if st.button("🔍 Analyze Data", key="analyze_data_button"):
+            if not user_query:
+                st.warning("Please enter a question or insight to analyze the data.")
+            else:
+                submit_job("data_job", data_file.file_id, analyze_data, dataset_text, user_query, api_key)
+                submitted = True
+
+        # Release this run's copy of the summary instead of holding it until the next rerun;
+        # the parsed frame itself is shared through the resource cache
+        dropped_bytes = sys.getsizeof(dataset_text)
+        del data, dataset_text
+        if dropped_bytes > LARGE_BUFFER_THRESHOLD:
+            gc.collect(1)
+
+    except Exception as e:
+        st.error(f"An error occurred while processing the file: {e}")
 
-                        # Display the result
-                        st.subheader("Analysis Result")
-                        st.markdown(response.content)
+    if submitted:
+        # Full rerun, so the tab starts polling the new job
+        st.rerun()
 
-                    except Exception as error:
-                        st.error(f"An error occurred during analysis: {error}")
+with media_type[2]:  # Data Analysis Tab
+    st.subheader("Data Analysis")
+    data_file = st.file_uploader("Upload a data file (Excel or CSV)", type=['csv', 'xlsx'], key="data_uploader",
+                                 help="Upload a dataset for AI analysis")
+
+    if data_file:
+        data_analysis(data_file)
 
-        except Exception as e:
-            st.error(f"An error occurred while processing the file: {e}")
+        render_job("data_job", data_file.file_id, "Analyzing data and gathering insights...")
 
 # Customize text area height
 st.markdown(
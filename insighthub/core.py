@@ -0,0 +1,417 @@
+import os
+import re
+import sys
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+from string import Template
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import streamlit as st
+from google.generativeai import upload_file, get_file
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+# Uploads are copied to disk in fixed-size chunks so large files never sit fully in memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Below this size the upload's in-memory buffer is written to the file directly in one pass
+DIRECT_WRITE_LIMIT = 64 * 1024 * 1024
+
+# RAM-backed tmpfs for scratch files, so the write-then-upload cycle never hits the disk
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+# Backoff bounds (seconds) while waiting for Gemini to finish processing an upload
+POLL_INITIAL_DELAY = 0.25
+POLL_MAX_DELAY = 4.0
+
+# Files above the threshold go through Gemini's resumable upload protocol in fixed chunks,
+# so memory stays flat and a dropped connection resumes instead of starting over
+GEMINI_UPLOAD_URL = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+RESUMABLE_UPLOAD_THRESHOLD = 100 * 1024 * 1024
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+RESUMABLE_MAX_RETRIES = 3
+# Backoff bounds (seconds) between attempts after a failed chunk
+RESUMABLE_RETRY_DELAY = 1.0
+RESUMABLE_RETRY_MAX_DELAY = 16.0
+# Seconds; chunk uploads get a generous overall timeout, connecting should be quick
+HTTP_TIMEOUT = 60.0
+HTTP_CONNECT_TIMEOUT = 10.0
+
+# Seconds between checks on a running analysis; the check never blocks the script thread
+JOB_POLL_INTERVAL = 1
+
+# Gemini keeps uploaded files for a limited time, so cached handles expire after an hour
+UPLOAD_CACHE_TTL = 60 * 60
+
+# Only a sample of the rows is sent to the agent, alongside the schema and summary statistics
+DATA_SAMPLE_ROWS = 200
+# Significant digits kept for the summary statistics; enough to leave counts, IDs and coordinates intact
+DATA_FLOAT_FORMAT = '%.10g'
+
+# Several questions asked at once are answered in one agent call, each answer under this heading
+ANSWER_MARKER = "### Answer {number}"
+ANSWER_MARKER_PATTERN = re.compile(r"^### Answer (\d+)\s*$", re.MULTILINE)
+
+# Analysis prompts, parsed once at import and filled in per request
+VIDEO_PROMPT = Template("""
+Analyze the uploaded video for content and context.
+Respond to the following query using video insights and supplementary web research:
+${query}
+
+Provide a detailed, user-friendly, and actionable response.
+""")
+
+IMAGE_PROMPT = Template("""
+Analyze the uploaded image in detail.
+Respond to the following query using image analysis and supplementary web research:
+${query}
+
+Provide a comprehensive, detailed, and informative response covering visual elements,
+context, and any relevant insights.
+""")
+
+DATA_PROMPT = Template("""
+Here is the dataset:
+${dataset}
+
+Respond to the following query using data analysis techniques:
+${query}
+
+Provide relevant statistics, trends, or actionable insights based on the dataset.
+""")
+
+# Above this many bytes of dropped buffers, a collection is forced instead of waiting for the GC
+LARGE_BUFFER_THRESHOLD = 32 * 1024 * 1024
+
+# Parsed datasets and agent responses are reused across reruns for half an hour
+CACHE_TTL = 30 * 60
+CACHE_MAX_ENTRIES = 32
+
+# On free-threaded CPython the dataset summary parts are computed in parallel across cores
+GIL_DISABLED = not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+def scratch_dir(size):
+    # Use tmpfs only while the file fits in half of its free space, to avoid exhausting memory
+    if SHM_DIR:
+        stats = os.statvfs(SHM_DIR)
+        if size < stats.f_bavail * stats.f_frsize // 2:
+            return SHM_DIR
+    return None
+
+class TmpPool:
+    # Scratch files grouped by the upload size they were used for, so repeated analyses
+    # overwrite an existing file instead of creating and unlinking a new one each time
+    BUCKETS = (256 * 1024, 4 * 1024 * 1024, 64 * 1024 * 1024)
+
+    def __init__(self, per_bucket=2):
+        self._per_bucket = per_bucket
+        self._free = {bucket: [] for bucket in self.BUCKETS}
+        self._leased = {}
+        self._lock = threading.Lock()
+        weakref.finalize(self, TmpPool._remove_all, self._free)
+
+    def acquire(self, min_size):
+        bucket = next((size for size in self.BUCKETS if size >= min_size), None)
+        with self._lock:
+            path = self._free[bucket].pop() if bucket and self._free[bucket] else None
+            if path is None:
+                fd, path = tempfile.mkstemp(prefix="insighthub-", dir=scratch_dir(bucket or min_size))
+                os.close(fd)
+            self._leased[path] = bucket
+        return path
+
+    def release(self, path):
+        with self._lock:
+            bucket = self._leased.pop(path, None)
+            if bucket is not None and len(self._free[bucket]) < self._per_bucket:
+                # Emptied now rather than on reuse, so idle files don't pin the last upload (in RAM on tmpfs)
+                os.truncate(path, 0)
+                self._free[bucket].append(path)
+                return
+        Path(path).unlink(missing_ok=True)
+
+    @staticmethod
+    def _remove_all(free):
+        for paths in free.values():
+            for path in paths:
+                Path(path).unlink(missing_ok=True)
+
+def get_tmp_pool():
+    if "tmp_pool" not in st.session_state:
+        st.session_state.tmp_pool = TmpPool()
+    return st.session_state.tmp_pool
+
+def write_upload(uploaded_file):
+    # Copy an upload into a pooled scratch file; hand the path back with get_tmp_pool().release()
+    path = get_tmp_pool().acquire(uploaded_file.size)
+    if uploaded_file.size < DIRECT_WRITE_LIMIT:
+        # Write from a view of the upload's buffer, so no bytes copy of the payload is made
+        fd = os.open(path, os.O_WRONLY | os.O_TRUNC)
+        try:
+            with uploaded_file.getbuffer() as view:
+                offset = 0
+                while offset < len(view):
+                    offset += os.write(fd, view[offset:])
+        finally:
+            os.close(fd)
+    else:
+        uploaded_file.seek(0)
+        with open(path, 'wb', buffering=UPLOAD_CHUNK_SIZE) as temp_file:
+            shutil.copyfileobj(uploaded_file, temp_file, length=UPLOAD_CHUNK_SIZE)
+    return path
+
+def initialize_agent():
+    # One agent per run: phi keeps the run's response on the instance, so sharing one across
+    # concurrent jobs could hand back another job's answer. Imported on first use.
+    from phi.agent import Agent
+    from phi.model.google import Gemini
+    from insighthub.tools import LazyDuckDuckGo
+
+    return Agent(
+        name="Media AI Analyzer",
+        model=Gemini(id="gemini-2.0-flash-exp"),
+        tools=[LazyDuckDuckGo()],
+        markdown=True,
+    )
+
+async def wait_until_ready(file):
+    delay = POLL_INITIAL_DELAY
+    while file.state.name == "PROCESSING":
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_DELAY)
+        # get_file blocks on the network, so keep it off the event loop
+        file = await asyncio.to_thread(get_file, file.name)
+    return file
+
+@st.cache_resource
+def get_http_client():
+    # Shared across uploads and threads, so TLS sessions are reused and requests multiplex over HTTP/2
+    return httpx.Client(
+        http2=True,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=8, keepalive_expiry=30),
+    )
+
+def is_transient(error):
+    # Network failures, rate limiting and server-side errors are worth retrying; other client errors are not
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+def upload_resumable(handle, size, mime_type, display_name, api_key):
+    client = get_http_client()
+    start = client.post(
+        GEMINI_UPLOAD_URL,
+        # Sent as a header, since httpx puts the full URL (query string included) in its error messages
+        headers={
+            "x-goog-api-key": api_key,
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(size),
+            "X-Goog-Upload-Header-Content-Type": mime_type,
+        },
+        json={"file": {"display_name": display_name}},
+    )
+    start.raise_for_status()
+    upload_url = start.headers["X-Goog-Upload-URL"]
+
+    offset = 0
+    retries = 0
+    resume = False
+    while True:
+        try:
+            if resume:
+                # Resume from however much the server has acknowledged
+                status = client.post(upload_url, headers={"X-Goog-Upload-Command": "query"})
+                status.raise_for_status()
+                if status.headers.get("X-Goog-Upload-Status") == "final":
+                    # The finalize went through but its response was lost; the query carries the file
+                    return get_file(status.json()["file"]["name"])
+                offset = int(status.headers["X-Goog-Upload-Size-Received"])
+                resume = False
+
+            handle.seek(offset)
+            chunk = handle.read(RESUMABLE_CHUNK_SIZE)
+            command = "upload, finalize" if offset + len(chunk) >= size else "upload"
+            response = client.post(
+                upload_url,
+                content=chunk,
+                headers={"X-Goog-Upload-Command": command, "X-Goog-Upload-Offset": str(offset)},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as error:
+            retries += 1
+            if not is_transient(error) or retries > RESUMABLE_MAX_RETRIES:
+                raise
+            time.sleep(min(RESUMABLE_RETRY_DELAY * 2 ** (retries - 1), RESUMABLE_RETRY_MAX_DELAY))
+            resume = True
+            continue
+
+        if command == "upload, finalize":
+            return get_file(response.json()["file"]["name"])
+        offset += len(chunk)
+        retries = 0
+
+def upload_cached(handle, mime_type, display_name, api_key):
+    # Reuse the Gemini file for content already uploaded in this session
+    digest = hashlib.file_digest(handle, 'sha256').hexdigest()
+
+    uploads = st.session_state.setdefault("uploaded_files", {})
+    cached = uploads.get(digest)
+    if cached and time.monotonic() - cached[1] < UPLOAD_CACHE_TTL:
+        try:
+            return get_file(cached[0])
+        except Exception:
+            # The remote copy expired or was deleted, upload it again
+            uploads.pop(digest, None)
+
+    size = handle.seek(0, os.SEEK_END)
+    handle.seek(0)
+    if size > RESUMABLE_UPLOAD_THRESHOLD:
+        processed = upload_resumable(handle, size, mime_type, display_name, api_key)
+    else:
+        processed = upload_file(handle, mime_type=mime_type, display_name=display_name)
+    uploads[digest] = (processed.name, time.monotonic())
+    return processed
+
+@st.cache_resource(
+    ttl=CACHE_TTL,
+    max_entries=CACHE_MAX_ENTRIES,
+    show_spinner=False,
+    hash_funcs={UploadedFile: lambda f: (f.file_id, f.size)}
+)
+def load_dataframe(data_file):
+    # Cached as a shared resource rather than copied out on every rerun; callers must not mutate it
+    import pandas as pd
+
+    # Fragment reruns hand back the same upload, which an earlier parse already read to the end
+    data_file.seek(0)
+
+    # Columnar readers: multi-threaded Arrow for CSV, calamine (Rust) for Excel
+    if data_file.name.endswith('.csv'):
+        return pd.read_csv(data_file, engine='pyarrow', dtype_backend='pyarrow')
+    return pd.read_excel(data_file, engine='calamine', dtype_backend='pyarrow')
+
+@st.cache_resource
+def get_cpu_executor():
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
+
+@st.cache_data(
+    ttl=CACHE_TTL,
+    max_entries=CACHE_MAX_ENTRIES,
+    show_spinner=False,
+    hash_funcs={UploadedFile: lambda f: (f.file_id, f.size)}
+)
+def summarize_dataset(data_file, _data):
+    # Keyed on the upload like load_dataframe; the DataFrame itself is not hashed
+    parts = (
+        lambda: _data.dtypes.to_frame('dtype').to_csv(),
+        lambda: _data.head(DATA_SAMPLE_ROWS).to_csv(index=False),
+        lambda: _data.describe(include='all').to_csv(float_format=DATA_FLOAT_FORMAT),
+    )
+    if GIL_DISABLED:
+        # Pure pandas work, so the workers need no script context
+        schema, sample, stats = get_cpu_executor().map(lambda part: part(), parts)
+    else:
+        schema, sample, stats = (part() for part in parts)
+    return f"Schema:\n{schema}\nSample:\n{sample}\nStats:\n{stats}"
+
+def api_key_scope(api_key):
+    # Digest of the API key for cache keys, so the key itself is never stored in the cache
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def run_agent(prompt, key_scope, media_name=None, _videos=None, _images=None):
+    # Keyed on the prompt, the caller's API key digest and the Gemini file name, so answers are only
+    # shared between sessions using the same key; the file handles are not hashed
+    return initialize_agent().run(prompt, videos=_videos, images=_images).content
+
+def batch_questions(user_query):
+    # One question per line; several are enumerated so a single agent run answers them all
+    questions = [line.strip() for line in user_query.splitlines() if line.strip()]
+    if len(questions) <= 1:
+        return user_query
+    numbered = "\n".join(f"{number}. {question}" for number, question in enumerate(questions, 1))
+    marker = ANSWER_MARKER.format(number="N")
+    return f"Answer each numbered question, starting each answer with a line `{marker}`:\n{numbered}"
+
+def split_answers(response):
+    # (heading, answer) pairs; a response without answer markers comes back as one unlabeled section
+    markers = list(ANSWER_MARKER_PATTERN.finditer(response))
+    if not markers:
+        return [(None, response)]
+
+    sections = []
+    for index, marker in enumerate(markers):
+        end = markers[index + 1].start() if index + 1 < len(markers) else len(response)
+        sections.append((f"Answer {marker.group(1)}", response[marker.end():end].strip()))
+
+    # Any preamble before the first marker belongs with the first answer
+    preamble = response[:markers[0].start()].strip()
+    if preamble:
+        heading, answer = sections[0]
+        sections[0] = (heading, f"{preamble}\n\n{answer}")
+    return sections
+
+def analyze_video(video_path, mime_type, display_name, user_query, api_key):
+    try:
+        # Upload and process video file, skipping the upload if it is unchanged
+        with open(video_path, 'rb', buffering=UPLOAD_CHUNK_SIZE) as handle:
+            processed_video = upload_cached(handle, mime_type, display_name, api_key)
+        processed_video = asyncio.run(wait_until_ready(processed_video))
+
+        # Prompt generation for video analysis
+        analysis_prompt = VIDEO_PROMPT.substitute(query=batch_questions(user_query))
+
+        # AI agent processing
+        return run_agent(analysis_prompt, api_key_scope(api_key), processed_video.name, _videos=[processed_video])
+    finally:
+        # Return the temporary video file to the pool
+        get_tmp_pool().release(video_path)
+
+def analyze_image(image, mime_type, display_name, user_query, api_key):
+    # `image` is an in-memory buffer, or a pooled scratch file path for very large images
+    try:
+        # Upload and process image file, skipping the upload if it is unchanged
+        if isinstance(image, str):
+            with open(image, 'rb', buffering=UPLOAD_CHUNK_SIZE) as handle:
+                processed_image = upload_cached(handle, mime_type, display_name, api_key)
+        else:
+            processed_image = upload_cached(image, mime_type, display_name, api_key)
+
+        # Prompt generation for image analysis
+        analysis_prompt = IMAGE_PROMPT.substitute(query=batch_questions(user_query))
+
+        # AI agent processing
+        return run_agent(analysis_prompt, api_key_scope(api_key), processed_image.name, _images=[processed_image])
+    finally:
+        if isinstance(image, str):
+            # Return the temporary image file to the pool
+            get_tmp_pool().release(image)
+
+def analyze_data(dataset_text, user_query, api_key):
+    # Prepare the analysis prompt
+    analysis_prompt = DATA_PROMPT.substitute(dataset=dataset_text, query=batch_questions(user_query))
+
+    # AI agent processing
+    return run_agent(analysis_prompt, api_key_scope(api_key))
+
+def submit_job(key, file_id, fn, *args):
+    # Analyses run on a per-session pool so the tabs don't wait on each other; the futures
+    # live in session state, tagged with the upload they analyze, and survive reruns
+    if "analysis_executor" not in st.session_state:
+        st.session_state.analysis_executor = ThreadPoolExecutor(max_workers=3)
+    ctx = get_script_run_ctx()
+
+    def job():
+        # Attach the script context so caches and session state work on the worker
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    st.session_state[key] = (file_id, st.session_state.analysis_executor.submit(job))
@@ -0,0 +1,41 @@
+from phi.tools import Toolkit
+
+
+class LazyDuckDuckGo(Toolkit):
+    # Registers the DuckDuckGo tools up front, but only imports duckduckgo_search
+    # and builds the real toolkit the first time the agent actually searches
+    def __init__(self):
+        super().__init__(name="duckduckgo")
+        self._toolkit = None
+        self.register(self.duckduckgo_search)
+        self.register(self.duckduckgo_news)
+
+    def _delegate(self):
+        if self._toolkit is None:
+            from phi.tools.duckduckgo import DuckDuckGo
+            self._toolkit = DuckDuckGo()
+        return self._toolkit
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DuckDuckGo for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DuckDuckGo.
+        """
+        return self._delegate().duckduckgo_search(query=query, max_results=max_results)
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DuckDuckGo.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DuckDuckGo.
+        """
+        return self._delegate().duckduckgo_news(query=query, max_results=max_results)